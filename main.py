@@ -1,58 +1,155 @@
+import asyncio
+import errno
 import uuid
+import functools
 import os  # os モジュールをインポート
+import stat
+import sys
 import glob  # glob モジュールをインポート
+import fnmatch
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from collections.abc import Iterator
 from fastmcp import FastMCP
 
 # --- セキュリティ設定 ---
-# このプロジェクトのルートディレクトリを許可する
-# os.path.abspath を使って絶対パスを取得し、正規化する
-ALLOWED_PROJECT_DIR = os.path.abspath("/Users/koichiro-hira/workspace/fastmcp-example")
+# 診断メッセージは標準エラー出力に出す (stdio トランスポートでは標準出力が JSON-RPC の通信路になるため)
+# 環境変数 FASTMCP_PROJECT_DIR で指定されたディレクトリ (未指定の場合はカレントディレクトリ) を許可する
+# 起動時に一度だけ os.path.realpath で絶対パスに変換し、シンボリックリンクを解決しておく
+ALLOWED_PROJECT_DIR = os.path.realpath(
+    os.environ.get("FASTMCP_PROJECT_DIR", os.getcwd())
+)
+
+if "FASTMCP_PROJECT_DIR" not in os.environ:
+    # 起動場所によっては意図しないディレクトリ全体を公開してしまうため、フォールバックしたことを明示する
+    print(
+        "Warning: FASTMCP_PROJECT_DIR is not set; falling back to the current directory "
+        f"'{ALLOWED_PROJECT_DIR}' as the allowed project directory.",
+        file=sys.stderr,
+    )
+
+if os.path.dirname(ALLOWED_PROJECT_DIR) == ALLOWED_PROJECT_DIR:
+    # ファイルシステムのルートを許可するとすべてのパスが許可範囲内になるため、すべてのアクセスを拒否する
+    print(
+        f"Warning: Allowed project directory '{ALLOWED_PROJECT_DIR}' is the filesystem root; "
+        "all file access will be denied. Set FASTMCP_PROJECT_DIR to a project directory.",
+        file=sys.stderr,
+    )
 
 if not os.path.isdir(ALLOWED_PROJECT_DIR):
     # 起動時にディレクトリが存在しない場合はエラーなど、適切な処理を検討
-    print(f"Warning: Allowed project directory '{ALLOWED_PROJECT_DIR}' does not exist.")
+    print(
+        f"Warning: Allowed project directory '{ALLOWED_PROJECT_DIR}' does not exist.",
+        file=sys.stderr,
+    )
     # raise Exception(f"Allowed project directory '{ALLOWED_PROJECT_DIR}' not found.") # 必要なら例外を送出
 
 
-def is_path_allowed(file_path: str) -> bool:
-    """指定されたパスがプロジェクトディレクトリ内にあるか検証する"""
+# ファイルを開く際にシンボリックリンクを辿らない / ブロックしないためのフラグ (未対応の OS では 0)
+_O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+_O_NONBLOCK = getattr(os, "O_NONBLOCK", 0)
+
+
+# realpath 済みの許可ディレクトリと、その末尾に区切り文字を付けたプレフィックスのキャッシュ
+# (設定値, 正規化済みパス, プレフィックス) の形で保持する
+# テストなどで ALLOWED_PROJECT_DIR が差し替えられた場合は次回参照時に再計算する
+_allowed_dir_cache: tuple[str, str, str] | None = None
+
+
+def _get_allowed_dir() -> tuple[str, str]:
+    """realpath 済みの許可ディレクトリとそのプレフィックス (末尾に os.sep) を返す"""
+    global _allowed_dir_cache
+    if _allowed_dir_cache is None or _allowed_dir_cache[0] != ALLOWED_PROJECT_DIR:
+        allowed_real = os.path.realpath(ALLOWED_PROJECT_DIR)
+        # 区切り文字の連結はここで一度だけ行う (ルートディレクトリの場合も "//" にならないようにする)
+        allowed_prefix = allowed_real.rstrip(os.sep) + os.sep
+        _allowed_dir_cache = (ALLOWED_PROJECT_DIR, allowed_real, allowed_prefix)
+    return _allowed_dir_cache[1], _allowed_dir_cache[2]
+
+
+def set_allowed_project_dir(dir_path: str) -> None:
+    """許可ディレクトリを変更する
+
+    新しいパスは realpath で解決して ALLOWED_PROJECT_DIR に設定する。
+    ファイルシステムのルートは指定できない (ValueError を送出する)。
+    """
+    global ALLOWED_PROJECT_DIR
+    real_dir = os.path.realpath(dir_path)
+    if os.path.dirname(real_dir) == real_dir:
+        raise ValueError(
+            f"Allowed project directory must not be the filesystem root: '{real_dir}'"
+        )
+    ALLOWED_PROJECT_DIR = real_dir
+    _get_allowed_dir()
+
+
+def _resolve_allowed_path(file_path: str) -> tuple[str, str] | None:
+    """パスがプロジェクトディレクトリ内にあれば (絶対パス, シンボリックリンク解決済みのパス) を、なければ None を返す
+
+    ツール側は検証時に求めたパスをそのまま使い、abspath / realpath をやり直さない。
+    絶対パスはシンボリックリンクを解決する前のもの (ファイルを開く際や lstat に使う)。
+    """
     try:
+        allowed_real, allowed_prefix = _get_allowed_dir()
+        # 許可ディレクトリがファイルシステムのルートの場合 (プレフィックスと一致する) はすべて拒否する
+        if allowed_real == allowed_prefix:
+            return None
         # 対象パスを絶対パスに変換し、シンボリックリンクを解決
-        abs_path = os.path.realpath(os.path.abspath(file_path))
+        # realpath の結果には ".." が残らないため、プレフィックス比較だけで判定できる
+        # (末尾要素の lstat と親ディレクトリの realpath に分けても、パス要素ごとの lstat の回数は変わらない)
+        abs_path = os.path.abspath(file_path)
+        real_path = os.path.realpath(abs_path)
 
         # ALLOWED_PROJECT_DIR 自体のパスも許可する
-        if abs_path == ALLOWED_PROJECT_DIR:
-            return True
-
-        # 指定されたパスが許可されたディレクトリで始まっているかチェック
-        # ディレクトリ区切り文字を追加して、部分一致を防ぐ (例: /allowed/dir と /allowed/dir_extra)
-        if abs_path.startswith(ALLOWED_PROJECT_DIR + os.sep):
-            # ディレクトリトラバーサル(../)が含まれていないかチェック
-            # os.path.relpath は ValueError を出す可能性があるので try-except で囲む
-            try:
-                relative_path = os.path.relpath(abs_path, ALLOWED_PROJECT_DIR)
-                if ".." in relative_path.split(os.sep):
-                    print(
-                        f"Warning: Path traversal attempt detected in '{file_path}' -> '{abs_path}'"
-                    )
-                    return False
-            except ValueError:
-                # Windows でドライブが異なる場合などに発生しうる
-                print(
-                    f"Warning: Could not determine relative path for '{abs_path}' relative to '{ALLOWED_PROJECT_DIR}'"
-                )
-                return False
-            return True
+        # ディレクトリ区切り文字付きのプレフィックスで比較し、部分一致を防ぐ (例: /allowed/dir と /allowed/dir_extra)
+        # 両辺とも正規化済みのため、包含判定は str.startswith で十分かつ正確
+        # os.path.commonpath や PurePath.is_relative_to はパスを要素に分割してオブジェクトを生成するため遅く、
+        # ホットパスであるここでは使わない (test_is_path_allowed_uses_prefix_compare で確認している)
+        if real_path == allowed_real or real_path.startswith(allowed_prefix):
+            return abs_path, real_path
+        return None
     except Exception as e:
         # パス解決中の予期せぬエラー
-        print(f"Error validating path '{file_path}': {e}")
-        return False
-    return False
+        print(f"Error validating path '{file_path}': {e}", file=sys.stderr)
+        return None
+
+
+def is_path_allowed(file_path: str) -> bool:
+    """指定されたパスがプロジェクトディレクトリ内にあるか検証する"""
+    return _resolve_allowed_path(file_path) is not None
 
 
 # -----------------------------
 
 
+# --- エラーメッセージ ---
+# パスだけを埋め込むエラーメッセージはテンプレートとして定義しておき、_format_error で生成する
+# (許可範囲外のパスを繰り返し試すクライアントに対しては、同じ文字列をキャッシュから返す)
+_ERR_READ_ACCESS_DENIED = "Error: Access denied. Reading from '{}' is not allowed or outside the project directory."
+_ERR_READ_NOT_FOUND = "Error: File not found at '{}'."
+_ERR_READ_PERMISSION = "Error: Permission denied when trying to read '{}'."
+_ERR_NOT_REGULAR_FILE = "Error: The path '{}' is not a regular file."
+_ERR_WRITE_ACCESS_DENIED = "Error: Access denied. Writing to '{}' is not allowed or outside the project directory."
+_ERR_WRITE_PERMISSION = "Error: Permission denied when trying to write to '{}' or create its parent directory."
+_ERR_WRITE_PARENT_SYMLINK = "Error: The parent directory of '{}' is a symbolic link."
+_ERR_LIST_ACCESS_DENIED = "Error: Access denied. Listing directory '{}' is not allowed or outside the project directory."
+_ERR_LIST_NOT_FOUND = "Error: Directory not found at '{}'."
+_ERR_LIST_NOT_A_DIRECTORY = "Error: The path '{}' is not a directory."
+_ERR_LIST_PERMISSION = "Error: Permission denied when trying to list directory '{}'."
+_ERR_FIND_ACCESS_DENIED = "Error: Access denied. Searching in '{}' is not allowed or outside the project directory."
+_ERR_FIND_NOT_FOUND = "Error: Base directory not found at '{}'."
+_ERR_FIND_NOT_A_DIRECTORY = "Error: The base path '{}' is not a directory."
+_ERR_FIND_PERMISSION = "Error: Permission denied during search in '{}'."
+
+
+@functools.lru_cache(maxsize=256)
+def _format_error(template: str, path: str) -> str:
+    """エラーメッセージのテンプレートにパスを埋め込む"""
+    return template.format(path)
+
+
 # Create an MCP server
 mcp = FastMCP("Demo")
 
@@ -63,55 +160,136 @@ def get_uuid() -> str:
     return str(uuid.uuid4())
 
 
+def _open_no_follow(path: str, flags: int) -> int:
+    """シンボリックリンクを辿らず、FIFO などでブロックしないフラグを付けてファイルを開く
+
+    呼び出し側で lstat による確認を済ませた後に、パスが差し替えられた場合への備え。
+    """
+    return os.open(path, flags | _O_NOFOLLOW | _O_NONBLOCK, 0o666)
+
+
+def _read_text_file(abs_file_path: str) -> str:
+    """ファイル全体を UTF-8 テキストとして読み込む
+
+    テキストモードの open() は TextIOWrapper がチャンクごとにデコードするため、
+    fstat で得たサイズの bytearray に直接読み込み、最後に一度だけデコードする。
+    改行はテキストモードと同じく CRLF / CR を LF に変換する。
+    """
+    with open(abs_file_path, "rb", buffering=0, opener=_open_no_follow) as f:
+        size = os.fstat(f.fileno()).st_size
+        buf = bytearray(size)
+        n = 0
+        with memoryview(buf) as view:
+            while n < size:
+                read = f.readinto(view[n:])
+                if not read:
+                    break
+                n += read
+        del buf[n:]
+        # サイズ 0 と報告される特殊ファイルや、読み込み中に伸びたファイルのため EOF まで読み足す
+        buf += f.readall()
+
+    text = buf.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
 # localのファイルをreadする
 @mcp.tool()
-def read_local_file(file_path: str) -> str:
+async def read_local_file(file_path: str) -> str:
     """Read a local file within the allowed project directory."""
-    if not is_path_allowed(file_path):
-        return f"Error: Access denied. Reading from '{file_path}' is not allowed or outside the project directory."
+    resolved = _resolve_allowed_path(file_path)
+    if resolved is None:
+        return _format_error(_ERR_READ_ACCESS_DENIED, file_path)
+    # セキュリティチェックを通ったので、検証時に解決したパスでファイルを開く
+    # (許可範囲内を指すシンボリックリンクは、find_files_by_pattern の結果と同じく読み込めるようにする)
+    _, real_file_path = resolved
     try:
-        # セキュリティチェックを通ったので、絶対パスでファイルを開く
-        abs_file_path = os.path.abspath(file_path)
-        with open(abs_file_path, "r", encoding="utf-8") as f:  # encodingを指定
-            return f.read()
+        # 開く前に lstat 1 回で通常ファイルであることを確認する
+        # (解決後に差し替えられたシンボリックリンクは辿らず、FIFO やデバイスファイルを開いてブロックすることも避ける)
+        if not stat.S_ISREG(os.lstat(real_file_path).st_mode):
+            return _format_error(_ERR_NOT_REGULAR_FILE, file_path)
+        # 読み込みはワーカースレッドで行い、他のツール呼び出しをブロックしない
+        return await asyncio.to_thread(_read_text_file, real_file_path)
     except FileNotFoundError:
-        return f"Error: File not found at '{file_path}'."
+        return _format_error(_ERR_READ_NOT_FOUND, file_path)
     except PermissionError:
-        return f"Error: Permission denied when trying to read '{file_path}'."
+        return _format_error(_ERR_READ_PERMISSION, file_path)
     except Exception as e:
         # UnicodeDecodeErrorなどもここで捕捉される
         return f"Error reading file '{file_path}': {e}"
 
 
+def _write_text_file(abs_file_path: str, content: str) -> None:
+    """テキストを UTF-8 でエンコードし、ファイルを上書きする
+
+    TextIOWrapper のチャンクごとのエンコード・バッファコピーを避け、一度だけエンコードして os.write で書き込む。
+    """
+    data = content.encode("utf-8")
+    # open(..., "w") と同じフラグ・パーミッション (umask 適用前 0o666) で開く
+    fd = _open_no_follow(abs_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        if data and hasattr(os, "posix_fallocate"):
+            # 事前に領域を確保し、連続したエクステントを割り当てやすくする
+            # 対応していないファイルシステムでは失敗するが、書き込み自体は続行できる
+            try:
+                os.posix_fallocate(fd, 0, len(data))
+            except OSError:
+                pass
+        # memoryview のスライスでコピーせずに残りを書き込む
+        with memoryview(data) as view:
+            written = 0
+            while written < len(data):
+                written += os.write(fd, view[written:])
+    finally:
+        os.close(fd)
+
+
 # localのファイルにwriteする
 @mcp.tool()
-def write_local_file(file_path: str, content: str) -> str:
+async def write_local_file(file_path: str, content: str) -> str:
     """Write content to a local file within the allowed project directory. Overwrites existing file."""
-    if not is_path_allowed(file_path):
-        return f"Error: Access denied. Writing to '{file_path}' is not allowed or outside the project directory."
+    resolved = _resolve_allowed_path(file_path)
+    if resolved is None:
+        return _format_error(_ERR_WRITE_ACCESS_DENIED, file_path)
+    abs_file_path, _ = resolved
 
     try:
-        abs_file_path = os.path.abspath(file_path)
         # 親ディレクトリが存在するか確認し、なければ作成する
         parent_dir = os.path.dirname(abs_file_path)
 
-        # 作成しようとしている親ディレクトリも許可範囲内かチェック
-        # is_path_allowed はファイル/ディレクトリ両方を想定してチェックするため、そのまま使える
-        if not is_path_allowed(parent_dir):
-            # is_path_allowed で ALLOWED_PROJECT_DIR 自体は許可されるはず
-            return f"Error: Cannot create directory '{parent_dir}' as it is outside the allowed project directory."
+        # 親ディレクトリの許可範囲チェックは不要
+        # 存在しないパスや通常ファイルの場合、_resolve_allowed_path は親ディレクトリを realpath で解決した上で
+        # 判定しているため、対象が許可範囲内であれば親ディレクトリも許可範囲内 (または ALLOWED_PROJECT_DIR 自体) になる
 
-        # ディレクトリ作成 (存在していてもエラーにならない)
+        # 既存のディレクトリへの書き込みが大半のため、まず lstat 1 回で存在を確認し、
+        # ディレクトリでない場合のみ作成する (存在していてもエラーにならない)
         # ここで権限エラーが発生する可能性もある
-        os.makedirs(parent_dir, exist_ok=True)
-
-        # ファイル書き込み
-        with open(abs_file_path, "w", encoding="utf-8") as f:  # encodingを指定
-            f.write(content)
+        # また、親ディレクトリがシンボリックリンクの場合は書き込まない (許可ディレクトリ自体を指す場合を除く)
+        try:
+            parent_st = os.lstat(parent_dir)
+        except FileNotFoundError:
+            parent_st = None
+        if parent_st is not None and stat.S_ISLNK(parent_st.st_mode):
+            if os.path.realpath(parent_dir) != _get_allowed_dir()[0]:
+                return _format_error(_ERR_WRITE_PARENT_SYMLINK, file_path)
+        elif parent_st is None or not stat.S_ISDIR(parent_st.st_mode):
+            os.makedirs(parent_dir, exist_ok=True)
+
+        # 既存のファイルを上書きする場合は通常ファイルに限る (シンボリックリンク経由の書き込みを防ぐ)
+        try:
+            if not stat.S_ISREG(os.lstat(abs_file_path).st_mode):
+                return _format_error(_ERR_NOT_REGULAR_FILE, file_path)
+        except FileNotFoundError:
+            pass
+
+        # ファイル書き込み (ワーカースレッドで行い、他のツール呼び出しをブロックしない)
+        await asyncio.to_thread(_write_text_file, abs_file_path, content)
         return f"Successfully wrote to file '{file_path}'."
     except PermissionError:
         # ディレクトリ作成 or ファイル書き込み時の権限エラー
-        return f"Error: Permission denied when trying to write to '{file_path}' or create its parent directory."
+        return _format_error(_ERR_WRITE_PERMISSION, file_path)
     except Exception as e:
         return f"Error writing to file '{file_path}': {e}"
 
@@ -127,28 +305,344 @@ def list_directory(dir_path: str) -> list[str] | str:
     Returns:
         A list of file and directory names, or an error message string.
     """
-    if not is_path_allowed(dir_path):
-        return f"Error: Access denied. Listing directory '{dir_path}' is not allowed or outside the project directory."
+    resolved = _resolve_allowed_path(dir_path)
+    if resolved is None:
+        return _format_error(_ERR_LIST_ACCESS_DENIED, dir_path)
+    abs_dir_path, _ = resolved
 
     try:
-        abs_dir_path = os.path.abspath(dir_path)
-
-        if not os.path.exists(abs_dir_path):
-            return f"Error: Directory not found at '{dir_path}'."
-
-        if not os.path.isdir(abs_dir_path):
-            return f"Error: The path '{dir_path}' is not a directory."
-
-        # os.listdir() は権限がない場合 PermissionError を送出する
-        contents = os.listdir(abs_dir_path)
-        return contents
+        # os.scandir() でディレクトリを 1 回だけ開き、エントリ名をまとめて取得する
+        # 存在しない場合は FileNotFoundError、ファイルの場合は NotADirectoryError、
+        # 権限がない場合は PermissionError を送出する
+        with os.scandir(abs_dir_path) as it:
+            return [entry.name for entry in it]
 
+    except FileNotFoundError:
+        return _format_error(_ERR_LIST_NOT_FOUND, dir_path)
+    except NotADirectoryError:
+        return _format_error(_ERR_LIST_NOT_A_DIRECTORY, dir_path)
     except PermissionError:
-        return f"Error: Permission denied when trying to list directory '{dir_path}'."
+        return _format_error(_ERR_LIST_PERMISSION, dir_path)
     except Exception as e:
         return f"Error listing directory '{dir_path}': {e}"
 
 
+def _scandir_entries(dir_path: str) -> list[os.DirEntry]:
+    """ディレクトリのエントリ一覧を返す (glob と同様、読み取れないディレクトリは空として扱う)
+
+    ただしファイルディスクリプタの上限 (EMFILE / ENFILE) は結果の取りこぼしにつながるため送出する。
+    """
+    try:
+        with os.scandir(dir_path) as it:
+            return list(it)
+    except OSError as e:
+        if e.errno in (errno.EMFILE, errno.ENFILE):
+            raise
+        return []
+
+
+# パターン要素をコンパイルした結果
+# "**" (再帰検索時のみ)・ワイルドカードを含まない文字列・(正規表現, "." で始まる名前に一致させるか) のいずれか
+_PatternPart = str | tuple[re.Pattern[str], bool]
+
+
+def _compile_pattern_parts(pattern_parts: list[str], recursive: bool) -> list[_PatternPart]:
+    """パターン要素のうちワイルドカードを含むものを、検索開始時に一度だけ正規表現へ変換する
+
+    fnmatch.filter はディレクトリごとに呼ぶたびにパターンの正規化とキャッシュ参照を行うため、
+    コンパイル済みの正規表現を走査全体で使い回す。
+    """
+    # fnmatch と同じく、大文字小文字を区別しないファイルシステム (Windows) では無視して比較する
+    flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+    compiled: list[_PatternPart] = []
+    for part in pattern_parts:
+        if (recursive and part == "**") or not glob.has_magic(part):
+            compiled.append(part)
+        else:
+            compiled.append(
+                (re.compile(fnmatch.translate(part), flags), part.startswith("."))
+            )
+    return compiled
+
+
+def _is_allowed_dir_symlink(path: str, st: os.stat_result | None = None) -> bool:
+    """path が許可範囲内のディレクトリを指すシンボリックリンクかを返す"""
+    if st is not None and not stat.S_ISLNK(st.st_mode):
+        return False
+    return os.path.isdir(path) and is_path_allowed(path)
+
+
+def _walk_matching(
+    base: str, parts: list[_PatternPart], entries: list[os.DirEntry] | None = None
+) -> Iterator[str]:
+    """base 以下で、_compile_pattern_parts でコンパイルしたパターン要素に一致するパスを順に返す
+
+    entries に base のエントリ一覧を渡した場合は、base を再度 scandir せずにそれを使う。
+    (ファイルディスクリプタで scandir したエントリは DirEntry.path が名前だけになるため、パスは base から組み立てる)
+
+    glob と同じく "." で始まる名前はパターン側も "." で始まる場合のみ一致させ、
+    "**" (recursive=True の場合のみ現れる) を 0 個以上のディレクトリに一致させる。
+    ディレクトリの判定は DirEntry の d_type を使う (追加の stat なし)。
+    "**" は循環を避けるためシンボリックリンクのディレクトリには降りない。
+    それ以外の要素では、リンク先が許可範囲内のディレクトリである場合に限りシンボリックリンクを辿る。
+    """
+    if not parts:
+        yield base
+        return
+
+    part, rest = parts[0], parts[1:]
+
+    if part == "**":
+        if not rest:
+            # 末尾の "**" は基点自身と配下のすべてのエントリに一致する
+            yield os.path.join(base, "")
+        else:
+            yield from _walk_matching(base, rest, entries)
+        for entry in _scandir_entries(base) if entries is None else entries:
+            if entry.name.startswith("."):
+                continue
+            entry_path = os.path.join(base, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_matching(entry_path, parts)
+            elif not rest and (not entry.is_symlink() or is_path_allowed(entry_path)):
+                yield entry_path
+        return
+
+    if isinstance(part, str):
+        # ワイルドカードを含まない要素はディレクトリを走査せずに結合する
+        if not part:
+            # 末尾の区切り文字 ("data/" など) はディレクトリのみに一致させる
+            yield from _walk_matching(os.path.join(base, ""), rest)
+            return
+        path = os.path.join(base, part)
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return
+        if rest:
+            if stat.S_ISDIR(st.st_mode) or _is_allowed_dir_symlink(path, st):
+                yield from _walk_matching(path, rest)
+        elif not stat.S_ISLNK(st.st_mode) or is_path_allowed(path):
+            yield path
+        return
+
+    regex, match_hidden = part
+    for entry in _scandir_entries(base) if entries is None else entries:
+        if not match_hidden and entry.name.startswith("."):
+            continue
+        if not regex.match(entry.name):
+            continue
+        entry_path = os.path.join(base, entry.name)
+        if rest:
+            if entry.is_dir(follow_symlinks=False) or (
+                entry.is_symlink() and _is_allowed_dir_symlink(entry_path)
+            ):
+                yield from _walk_matching(entry_path, rest)
+        # シンボリックリンク (d_type で判定できる) のみリンク先が許可範囲内か確認する
+        elif not entry.is_symlink() or is_path_allowed(entry_path):
+            yield entry_path
+
+
+# 再帰検索で使うスレッド数
+# scandir はシステムコール中に GIL を解放するため、CPU 数より多めのスレッドで待ち時間を重ねられる
+_FIND_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+
+# 再帰検索で共有するスレッドプール (呼び出しごとにスレッドを生成・破棄しない)
+# スレッドは最初に使われた時点で必要な分だけ生成される
+_FIND_EXECUTOR = ThreadPoolExecutor(
+    max_workers=_FIND_MAX_WORKERS, thread_name_prefix="find_files"
+)
+
+
+# ディレクトリをファイルディスクリプタ経由で走査できるか (Windows などでは未対応のためパスで走査する)
+_SCANDIR_FD_SUPPORTED = os.scandir in os.supports_fd and os.open in os.supports_dir_fd
+_O_DIRECTORY = getattr(os, "O_DIRECTORY", 0)
+
+# サブディレクトリを openat で開くために保持しておく親ディレクトリの fd の上限 (全検索で共有)
+# 上限に達した場合、そのディレクトリの fd はすぐに閉じ、子ディレクトリはパスで開く
+# (同時に開く fd の数は、この上限と実行中のワーカー数の和で頭打ちになる)
+_FIND_HELD_DIR_FDS = threading.BoundedSemaphore(_FIND_MAX_WORKERS)
+
+
+class _HeldDirFd:
+    """子ディレクトリがすべて openat で開き終わるまで、親ディレクトリの fd を開いておく"""
+
+    def __init__(self, fd: int, users: int) -> None:
+        self.fd = fd
+        self._users = users
+        self._lock = threading.Lock()
+
+    def release(self, count: int = 1) -> None:
+        """子ディレクトリ count 個分の利用を終え、最後の利用者であれば fd を閉じる"""
+        with self._lock:
+            self._users -= count
+            if self._users > 0:
+                return
+        os.close(self.fd)
+        _FIND_HELD_DIR_FDS.release()
+
+
+def _scandir_tree_level(
+    dir_path: str, parent: _HeldDirFd | None = None, follow_symlinks: bool = False
+) -> tuple[list[os.DirEntry], list[str], _HeldDirFd | None]:
+    """1 ディレクトリ分を走査し、(エントリ一覧, 降りるサブディレクトリのパス一覧, 子ディレクトリ用に保持した fd) を返す
+
+    os.fwalk と同様に、ディレクトリは親ディレクトリの fd からの相対名で開き (openat)、fd 経由で scandir する。
+    カーネルが毎回絶対パスを先頭から解決せずに済み、O_NOFOLLOW によって
+    判定後にシンボリックリンクへ差し替えられたディレクトリにも降りない。
+    親の fd を保持できなかった場合 (parent が None) はパスで開くため、
+    O_NOFOLLOW が防げるのは末尾要素の差し替えのみとなる。
+    (検証済みの起点ディレクトリのみ follow_symlinks=True でシンボリックリンクを辿って開く)
+    fd を閉じる前にエントリの種別判定を済ませて DirEntry にキャッシュさせておく
+    (d_type が得られないファイルシステムでは is_dir / is_symlink がその fd で lstat するため)。
+    ファイルディスクリプタの上限 (EMFILE / ENFILE) は結果の取りこぼしにつながるため握りつぶさずに送出する。
+    """
+    try:
+        if not _SCANDIR_FD_SUPPORTED:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+            subdirs = [
+                entry.path
+                for entry in entries
+                if not entry.name.startswith(".")
+                and entry.is_dir(follow_symlinks=False)
+            ]
+            return entries, subdirs, None
+
+        flags = os.O_RDONLY | _O_DIRECTORY
+        if not follow_symlinks:
+            flags |= _O_NOFOLLOW
+        if parent is None:
+            dir_fd = os.open(dir_path, flags)
+        else:
+            try:
+                dir_fd = os.open(os.path.basename(dir_path), flags, dir_fd=parent.fd)
+            finally:
+                parent.release()
+        held = None
+        try:
+            with os.scandir(dir_fd) as it:
+                entries = list(it)
+            subdirs = []
+            for entry in entries:
+                # fd を閉じた後も使えるよう、種別をここで確定させる
+                entry.is_symlink()
+                if not entry.name.startswith(".") and entry.is_dir(
+                    follow_symlinks=False
+                ):
+                    subdirs.append(os.path.join(dir_path, entry.name))
+            if subdirs and _FIND_HELD_DIR_FDS.acquire(blocking=False):
+                held = _HeldDirFd(dir_fd, len(subdirs))
+        finally:
+            if held is None:
+                os.close(dir_fd)
+    except OSError as e:
+        if e.errno in (errno.EMFILE, errno.ENFILE):
+            raise
+        # glob と同様、読み取れないディレクトリは空として扱う
+        return [], [], None
+    return entries, subdirs, held
+
+
+def _scandir_tree_parallel(base: str) -> Iterator[tuple[str, list[os.DirEntry]]]:
+    """base と配下のすべてのディレクトリを並列に scandir し、(ディレクトリのパス, エントリ一覧) を返す
+
+    "**" と同じく "." で始まるディレクトリとシンボリックリンクのディレクトリには降りない。
+    走査自体は並列に進めるが、結果は投入した順 (ディレクトリの幅優先順) に返すため、
+    同じディレクトリ構造に対しては毎回同じ順序になる。
+    """
+    pending = deque(
+        [(base, None, _FIND_EXECUTOR.submit(_scandir_tree_level, base, None, True))]
+    )
+    try:
+        while pending:
+            dir_path, _, future = pending[0]
+            entries, subdirs, held = future.result()
+            pending.popleft()
+            for sub_path in subdirs:
+                pending.append(
+                    (
+                        sub_path,
+                        held,
+                        _FIND_EXECUTOR.submit(_scandir_tree_level, sub_path, held),
+                    )
+                )
+            yield dir_path, entries
+    finally:
+        # 途中で打ち切られた場合、未着手の走査は破棄する (プールは共有のため停止しない)
+        # 破棄した走査の分の親 fd の利用を終え、完了済みの走査が保持した fd も閉じる
+        for _, parent, future in pending:
+            if future.cancel():
+                if parent is not None:
+                    parent.release()
+                continue
+            try:
+                _, subdirs, held = future.result()
+            except OSError:
+                continue
+            if held is not None:
+                held.release(len(subdirs))
+
+
+def _walk_matching_parallel(base: str, parts: list[_PatternPart]) -> Iterator[str]:
+    """先頭が "**" のパターンについて、_walk_matching と同じ結果をディレクトリの並列走査で返す"""
+    rest = parts[1:]
+    for dir_path, entries in _scandir_tree_parallel(base):
+        if rest:
+            # 各ディレクトリで残りのパターンを評価する (そのディレクトリの scandir 結果を再利用)
+            yield from _walk_matching(dir_path, rest, entries)
+            continue
+        # 末尾の "**" はディレクトリ自身と配下のすべてのエントリに一致する
+        yield os.path.join(dir_path, "")
+        for entry in entries:
+            if entry.name.startswith(".") or entry.is_dir(follow_symlinks=False):
+                continue
+            entry_path = os.path.join(dir_path, entry.name)
+            if not entry.is_symlink() or is_path_allowed(entry_path):
+                yield entry_path
+
+
+# 検索結果の相対パスの先頭に付ける "./" (結果ごとに連結しないよう定数化)
+_CURRENT_DIR_PREFIX = "." + os.sep
+
+
+def _unresolved_project_path(
+    path: str, real_path: str, allowed_real: str, allowed_prefix: str
+) -> str:
+    """許可範囲内と確認済みの正規化パスを、シンボリックリンクを解決する前の位置のまま返す
+
+    パスが字句上は許可ディレクトリの外にある場合 (許可範囲外からのシンボリックリンク経由など) は、
+    親ディレクトリを realpath で解決した位置を、それでも外にある場合は解決済みの real_path を返す。
+    """
+    if path == allowed_real or path.startswith(allowed_prefix):
+        return path
+    parent_dir, name = os.path.split(path)
+    if name:
+        parent_resolved = os.path.join(os.path.realpath(parent_dir), name)
+        if parent_resolved.startswith(allowed_prefix):
+            return parent_resolved
+    return real_path
+
+
+def _to_project_relative(path_abs: str, allowed_real: str, allowed_prefix: str) -> str:
+    """検索結果の絶対パスをプロジェクトルートからの相対パス ("./" 始まり) に変換する
+
+    検索結果は常に許可ディレクトリ配下にあるため、os.path.relpath (両パスを要素ごとに分割して比較) を使わず、
+    正規化したパスからプレフィックスを取り除くだけで済ませる。
+    """
+    normalized = os.path.normpath(path_abs)
+    if normalized == allowed_real:
+        return "."
+    if not normalized.startswith(allowed_prefix):
+        # 通常は起こらないが、念のため relpath で変換する
+        return os.path.relpath(normalized, allowed_real)
+    rel_path = normalized[len(allowed_prefix) :]
+    # 先頭に `./` を補完する (従来の relpath ベースの変換と同じく "." で始まる名前には付けない)
+    if not rel_path.startswith((".", "..")):
+        rel_path = _CURRENT_DIR_PREFIX + rel_path
+    return rel_path
+
+
 # ファイルパターン検索
 @mcp.tool()
 def find_files_by_pattern(
@@ -158,64 +652,99 @@ def find_files_by_pattern(
 
     Args:
         base_dir: The base directory to start the search from.
-        pattern: The glob pattern to match (e.g., '*.txt', 'data/**/').
-        recursive: If True, search recursively into subdirectories. Uses '**' in glob.
+        pattern: The glob pattern to match (e.g., '*.txt', 'data/**/'). It is joined onto
+            base_dir like glob does (an absolute pattern replaces base_dir); the part before
+            the first wildcard must resolve inside the allowed project directory.
+            Symbolic links to directories inside the project are followed for explicit
+            components, but '**' (and recursive=True) never descends into them.
+        recursive: If True, search recursively into subdirectories (same as prefixing the pattern with '**/').
 
     Returns:
         A list of matching file/directory paths relative to the project root,
         or an error message string.
     """
-    if not is_path_allowed(base_dir):
-        return f"Error: Access denied. Searching in '{base_dir}' is not allowed or outside the project directory."
+    resolved = _resolve_allowed_path(base_dir)
+    if resolved is None:
+        return _format_error(_ERR_FIND_ACCESS_DENIED, base_dir)
 
     try:
-        abs_base_dir = os.path.abspath(base_dir)
+        allowed_real, allowed_prefix = _get_allowed_dir()
+        # 結果は glob と同じくシンボリックリンクを解決する前の位置で返すため、解決前の基点から検索する
+        # (許可範囲の判定は realpath 済みのパスで済んでいる)
+        abs_base_dir = _unresolved_project_path(*resolved, allowed_real, allowed_prefix)
 
         if not os.path.exists(abs_base_dir):
-            return f"Error: Base directory not found at '{base_dir}'."
+            return _format_error(_ERR_FIND_NOT_FOUND, base_dir)
 
         if not os.path.isdir(abs_base_dir):
-            return f"Error: The base path '{base_dir}' is not a directory."
+            return _format_error(_ERR_FIND_NOT_A_DIRECTORY, base_dir)
 
-        # globパターンを結合
+        # glob と同じく基点ディレクトリとパターンを結合する
+        # (絶対パスのパターンは基点を置き換える)
         # recursive=True の場合、'**/' をパターンに追加して再帰的に検索
-        # os.path.join は / で終わる場合、正しく結合してくれる
-        search_pattern = (
+        search_path = (
             os.path.join(abs_base_dir, "**", pattern)
             if recursive
             else os.path.join(abs_base_dir, pattern)
         )
-
-        # glob.glob は絶対パスを返す
-        # recursive=True を glob に渡す必要がある
-        matched_paths_abs = glob.glob(search_pattern, recursive=recursive)
-
-        allowed_paths = []
-        for path_abs in matched_paths_abs:
-            # 念のため、globの結果が許可範囲内か再度チェック
-            # is_path_allowed は絶対パスで評価する
-            if is_path_allowed(path_abs):
-                # 結果はプロジェクトルートからの相対パスで返す方が使いやすい場合がある
-                # ここでは絶対パスのまま返すか、相対パスに変換するか選択可能
-                # 例: 相対パスにする場合
-                try:
-                    rel_path = os.path.relpath(path_abs, ALLOWED_PROJECT_DIR)
-                    # Windowsでは `./` が先頭につかないことがあるため補完
-                    if not rel_path.startswith((".", "..")):
-                        rel_path = "." + os.sep + rel_path
-                    allowed_paths.append(rel_path)
-                except ValueError:
-                    # ALLOWED_PROJECT_DIR と異なるドライブなどの場合 (通常は起こらないはず)
-                    # その場合は絶対パスのまま追加するなどのフォールバックも可能
-                    allowed_paths.append(path_abs)
-                    print(
-                        f"Warning: Could not create relative path for {path_abs}. Returning absolute path."
-                    )
-
-        return allowed_paths
+        search_parts = search_path.split(os.sep)
+
+        # ワイルドカードを含まない先頭の要素は正規化して走査の起点ディレクトリとし、
+        # 'data/raw/*.csv' のようなパターンでは data/raw 以外のディレクトリは読まない
+        # ("**" などワイルドカードより後ろの ".." は一致したディレクトリごとに意味が変わるため正規化しない)
+        literal_count = 0
+        while literal_count < len(search_parts) and not glob.has_magic(
+            search_parts[literal_count]
+        ):
+            literal_count += 1
+
+        if literal_count == len(search_parts):
+            # ワイルドカードを含まないパターンは、正規化したパスの存在確認だけで済ませる
+            literal_path = os.path.normpath(search_path)
+            resolved_literal = _resolve_allowed_path(literal_path)
+            if (
+                resolved_literal is None
+                or not os.path.lexists(literal_path)
+                or (search_path.endswith(os.sep) and not os.path.isdir(literal_path))
+            ):
+                return []
+            # 結果はシンボリックリンクを解決する前の位置で返す
+            literal_path = _unresolved_project_path(
+                literal_path, resolved_literal[1], allowed_real, allowed_prefix
+            )
+            return [_to_project_relative(literal_path, allowed_real, allowed_prefix)]
+
+        # 起点ディレクトリが許可範囲内にあるかを、正規化・シンボリックリンク解決した上で確認する
+        # (許可範囲外を起点とするパターンは一致なしとして扱う)
+        start_dir = os.path.normpath(os.sep.join(search_parts[:literal_count]) or os.sep)
+        resolved_start = _resolve_allowed_path(start_dir)
+        if resolved_start is None or not os.path.isdir(resolved_start[1]):
+            return []
+        # 結果はシンボリックリンクを解決する前の位置で返すため、解決前の位置から走査する
+        start_dir = _unresolved_project_path(
+            start_dir, resolved_start[1], allowed_real, allowed_prefix
+        )
+        pattern_parts = search_parts[literal_count:]
+        compiled_parts = _compile_pattern_parts(pattern_parts, recursive)
+
+        # 走査は許可範囲内に閉じているため、結果ごとの is_path_allowed の再チェックは不要
+        # ただしワイルドカードより後ろに ".." を含むパターンは許可範囲外へ出うるため、結果ごとに確認する
+        # 再帰検索はサブディレクトリごとの scandir を並列に実行する
+        # MCP の応答としてシリアライズするため最終的にはリストを返すが、
+        # 走査結果はジェネレータのまま相対パスへ変換し、中間リストは作らない
+        walker = (
+            _walk_matching_parallel if compiled_parts[0] == "**" else _walk_matching
+        )
+        matched_paths = walker(start_dir, compiled_parts)
+        if ".." in pattern_parts:
+            matched_paths = (p for p in matched_paths if is_path_allowed(p))
+        return [
+            _to_project_relative(path_abs, allowed_real, allowed_prefix)
+            for path_abs in matched_paths
+        ]
 
     except PermissionError:
-        return f"Error: Permission denied during search in '{base_dir}'."
+        return _format_error(_ERR_FIND_PERMISSION, base_dir)
     except Exception as e:
         return f"Error finding files with pattern '{pattern}' in '{base_dir}': {e}"
 
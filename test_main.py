@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import os
 from pathlib import Path
@@ -130,13 +131,13 @@ def test_list_directory_outside_allowed(tmp_path: Path):
 
 
 def test_list_directory_permission_error(tmp_path: Path, monkeypatch):
-    """Tests the behavior when os.listdir raises a PermissionError."""
+    """Tests the behavior when os.scandir raises a PermissionError."""
 
-    # Setup: Mock os.listdir to raise PermissionError
-    def mock_listdir_permission(path):
+    # Setup: Mock os.scandir to raise PermissionError
+    def mock_scandir_permission(path):
         raise PermissionError(f"Simulated permission denied for {path}")
 
-    monkeypatch.setattr(os, "listdir", mock_listdir_permission)
+    monkeypatch.setattr(os, "scandir", mock_scandir_permission)
 
     # Action: Call the function (it should catch the mocked PermissionError)
     result = main.list_directory(str(tmp_path))
@@ -148,3 +149,726 @@ def test_list_directory_permission_error(tmp_path: Path, monkeypatch):
 
 # You can add more tests here for other edge cases if needed
 # e.g., paths with special characters, very long paths (if relevant), etc.
+
+
+# --- Test Cases for is_path_allowed ---
+
+
+def test_is_path_allowed_root_and_children(tmp_path: Path):
+    """Tests that the allowed directory itself and paths under it are allowed."""
+    # Setup: Create a nested file
+    nested_dir = tmp_path / "nested"
+    nested_dir.mkdir()
+    (nested_dir / "file.txt").touch()
+
+    # Assertion: The root, a subdirectory and a (possibly non-existent) file are all allowed
+    assert main.is_path_allowed(str(tmp_path))
+    assert main.is_path_allowed(str(nested_dir))
+    assert main.is_path_allowed(str(nested_dir / "file.txt"))
+    assert main.is_path_allowed(str(tmp_path / "not_yet_created.txt"))
+
+
+def test_is_path_allowed_rejects_sibling_with_same_prefix(tmp_path: Path):
+    """Tests that a sibling directory sharing the name prefix is not allowed."""
+    # Setup: e.g. /tmp/.../test0 (allowed) vs /tmp/.../test0_extra (not allowed)
+    sibling = tmp_path.parent / (tmp_path.name + "_extra")
+
+    # Assertion: The prefix check must not match partial directory names
+    assert not main.is_path_allowed(str(sibling))
+    assert not main.is_path_allowed(str(sibling / "file.txt"))
+
+
+def test_is_path_allowed_rejects_traversal(tmp_path: Path):
+    """Tests that '..' segments escaping the allowed directory are rejected."""
+    # Setup: A path that starts inside tmp_path but climbs out of it
+    traversal_path = os.path.join(str(tmp_path), "subdir", "..", "..", "outside.txt")
+
+    # Assertion: realpath collapses the '..' segments so the path ends up outside
+    assert not main.is_path_allowed(traversal_path)
+
+
+def test_is_path_allowed_collapses_parent_segments(tmp_path: Path):
+    """Tests that '..' segments are collapsed before the prefix comparison."""
+    # Setup: Paths that contain '..' but resolve inside / outside tmp_path
+    escaping = os.path.join(str(tmp_path), "..", "foo")
+    reentering = os.path.join(str(tmp_path), "..", tmp_path.name, "foo")
+    staying_inside = os.path.join(str(tmp_path), "subdir", "..", "foo")
+
+    # Assertion: Only the resolved location matters, not the presence of '..'
+    assert not main.is_path_allowed(escaping)
+    assert main.is_path_allowed(reentering)
+    assert main.is_path_allowed(staying_inside)
+
+
+def test_is_path_allowed_rejects_symlink_escape(tmp_path: Path):
+    """Tests that symlinks pointing outside the allowed directory are rejected."""
+    # Setup: Create a directory outside tmp_path and link to it from inside
+    outside_dir = tmp_path.parent / (tmp_path.name + "_outside")
+    outside_dir.mkdir()
+    (outside_dir / "secret.txt").touch()
+    (tmp_path / "dir_link").symlink_to(outside_dir)
+    (tmp_path / "file_link").symlink_to(outside_dir / "secret.txt")
+
+    # Assertion: Both a symlinked file and a file under a symlinked directory are rejected
+    assert not main.is_path_allowed(str(tmp_path / "file_link"))
+    assert not main.is_path_allowed(str(tmp_path / "dir_link"))
+    assert not main.is_path_allowed(str(tmp_path / "dir_link" / "secret.txt"))
+
+
+def test_is_path_allowed_not_cached_across_calls(tmp_path: Path):
+    """Tests that a directory replaced by a symlink is not allowed from a stale cache."""
+    # Setup: Warm the cache with a real subdirectory
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    assert main.is_path_allowed(str(sub / "child"))
+
+    # Action: Replace the subdirectory with a symlink pointing outside
+    outside_dir = tmp_path.parent / (tmp_path.name + "_outside")
+    outside_dir.mkdir()
+    sub.rmdir()
+    sub.symlink_to(outside_dir)
+
+    # Assertion: A bare check rejects the path instead of reusing the earlier resolution
+    assert not main.is_path_allowed(str(sub / "child"))
+    result = main.list_directory(str(sub / "child"))
+    assert isinstance(result, str)
+    assert "Error: Access denied" in result
+
+
+def test_is_path_allowed_symlink_loop_and_long_name(tmp_path: Path, capsys):
+    """Tests that lstat-level errors are not reported as access denied."""
+    # Setup: A symlink loop and a name longer than NAME_MAX inside the allowed directory
+    (tmp_path / "loop").symlink_to("loop")
+    loop_child = str(tmp_path / "loop" / "x")
+    long_name = str(tmp_path / ("a" * 300))
+
+    # Assertion: Both paths are inside the project, so the check passes without a validation error
+    assert main.is_path_allowed(loop_child)
+    assert main.is_path_allowed(long_name)
+    assert "Error validating path" not in capsys.readouterr().err
+
+    # Assertion: The tools report the real OS error instead of "Access denied"
+    for path in (loop_child, long_name):
+        result = asyncio.run(main.read_local_file(path))
+        assert result.startswith("Error reading file")
+        assert "Access denied" not in result
+
+
+def test_is_path_allowed_uses_prefix_compare(tmp_path: Path, monkeypatch):
+    """Tests that containment is decided by a plain prefix compare, not commonpath / PurePath."""
+    import pathlib
+
+    # Setup: Make the slower containment helpers fail loudly if they are used
+    def fail(*args, **kwargs):
+        raise AssertionError("containment must use str.startswith")
+
+    monkeypatch.setattr(os.path, "commonpath", fail)
+    monkeypatch.setattr(pathlib.PurePath, "is_relative_to", fail)
+
+    # Assertion: is_path_allowed still works (and prints no validation error)
+    assert main.is_path_allowed(str(tmp_path / "a.txt"))
+    assert not main.is_path_allowed(str(tmp_path.parent / "a.txt"))
+
+
+def test_is_path_allowed_time_budget(tmp_path: Path):
+    """Guards against accidental slowdowns of the hot path check (generous budget)."""
+    import time
+
+    # Setup: Warm the caches with a nested path
+    (tmp_path / "sub").mkdir()
+    target = str(tmp_path / "sub" / "file.txt")
+    main.is_path_allowed(target)
+
+    # Action: Time repeated checks of the same path
+    iterations = 2000
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        main.is_path_allowed(target)
+    per_call_ns = (time.perf_counter_ns() - start) / iterations
+
+    # Assertion: One check (abspath + realpath + prefix compare) stays well under 100 µs
+    assert per_call_ns < 100_000
+
+
+def test_set_allowed_project_dir(tmp_path: Path):
+    """Tests switching the allowed directory at runtime."""
+    # Setup: Two sibling directories, only the first one allowed initially
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    main.set_allowed_project_dir(str(first))
+    assert main.is_path_allowed(str(first / "a.txt"))
+    assert not main.is_path_allowed(str(second / "a.txt"))
+
+    # Action: Switch to the second directory
+    main.set_allowed_project_dir(str(second))
+
+    # Assertion: The allowed range follows the new directory
+    assert main.ALLOWED_PROJECT_DIR == os.path.realpath(second)
+    assert not main.is_path_allowed(str(first / "a.txt"))
+    assert main.is_path_allowed(str(second / "a.txt"))
+
+
+def test_is_path_allowed_denies_all_when_allowed_dir_is_root(tmp_path: Path, monkeypatch):
+    """Tests that a filesystem-root allowed directory (e.g. the cwd fallback at '/') allows nothing."""
+    # Setup: Point the allowed directory at the filesystem root
+    monkeypatch.setattr(main, "ALLOWED_PROJECT_DIR", os.sep)
+    (tmp_path / "a.txt").write_text("secret")
+
+    # Assertion: Every path is rejected, including the root itself
+    assert not main.is_path_allowed(str(tmp_path / "a.txt"))
+    assert not main.is_path_allowed(os.sep)
+    result = asyncio.run(main.read_local_file(str(tmp_path / "a.txt")))
+    assert "Error: Access denied" in result
+
+    # Assertion: The root cannot be configured at runtime either
+    with pytest.raises(ValueError):
+        main.set_allowed_project_dir(os.sep)
+    assert main.ALLOWED_PROJECT_DIR == os.sep
+
+
+def test_startup_warnings_go_to_stderr(tmp_path: Path):
+    """Tests that import-time warnings never write to stdout (the stdio JSON-RPC stream)."""
+    import subprocess
+    import sys
+
+    # Setup: Import main from the filesystem root without FASTMCP_PROJECT_DIR
+    env = {k: v for k, v in os.environ.items() if k != "FASTMCP_PROJECT_DIR"}
+    env["PYTHONPATH"] = os.path.dirname(os.path.abspath(main.__file__))
+
+    # Action: Import the module in a fresh interpreter
+    completed = subprocess.run(
+        [sys.executable, "-c", "import main"],
+        cwd=os.sep,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Assertion: Both the cwd fallback and the root warnings are on stderr, stdout stays empty
+    assert completed.stdout == ""
+    assert "FASTMCP_PROJECT_DIR is not set" in completed.stderr
+    assert "is the filesystem root" in completed.stderr
+
+
+# --- Test Cases for find_files_by_pattern ---
+
+
+def test_find_files_by_pattern_flat(tmp_path: Path):
+    """Tests a non-recursive wildcard search directly under the base directory."""
+    # Setup: Create matching and non-matching files, plus a nested match that must be ignored
+    (tmp_path / "a.txt").touch()
+    (tmp_path / "b.txt").touch()
+    (tmp_path / "c.py").touch()
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "d.txt").touch()
+
+    # Action: Search for *.txt without recursion
+    result = main.find_files_by_pattern(str(tmp_path), "*.txt")
+
+    # Assertion: Only the top-level .txt files are returned, relative to the project root
+    assert isinstance(result, list)
+    assert sorted(result) == [os.path.join(".", "a.txt"), os.path.join(".", "b.txt")]
+
+
+def test_find_files_by_pattern_recursive(tmp_path: Path):
+    """Tests a recursive wildcard search into subdirectories."""
+    # Setup: Create matches at several depths
+    (tmp_path / "a.txt").touch()
+    (tmp_path / "sub" / "deeper").mkdir(parents=True)
+    (tmp_path / "sub" / "b.txt").touch()
+    (tmp_path / "sub" / "deeper" / "c.txt").touch()
+    (tmp_path / "sub" / "deeper" / "d.py").touch()
+
+    # Action: Search for *.txt recursively
+    result = main.find_files_by_pattern(str(tmp_path), "*.txt", recursive=True)
+
+    # Assertion: Matches from every depth are returned
+    assert isinstance(result, list)
+    assert sorted(result) == sorted(
+        [
+            os.path.join(".", "a.txt"),
+            os.path.join(".", "sub", "b.txt"),
+            os.path.join(".", "sub", "deeper", "c.txt"),
+        ]
+    )
+
+
+def test_find_files_by_pattern_literal_prefix(tmp_path: Path):
+    """Tests patterns whose leading components contain no wildcard characters."""
+    # Setup: Create files under a literal subdirectory path
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    (tmp_path / "data" / "raw" / "x.csv").touch()
+    (tmp_path / "data" / "raw" / "y.json").touch()
+
+    # Action: Search with a literal prefix followed by a wildcard, and a fully literal pattern
+    wildcard_result = main.find_files_by_pattern(
+        str(tmp_path), os.path.join("data", "raw", "*.csv")
+    )
+    literal_result = main.find_files_by_pattern(
+        str(tmp_path), os.path.join("data", "raw", "y.json")
+    )
+    missing_result = main.find_files_by_pattern(
+        str(tmp_path), os.path.join("data", "missing.txt")
+    )
+
+    # Assertion: Both forms find the expected file, and a missing literal path finds nothing
+    assert wildcard_result == [os.path.join(".", "data", "raw", "x.csv")]
+    assert literal_result == [os.path.join(".", "data", "raw", "y.json")]
+    assert missing_result == []
+
+
+def test_find_files_by_pattern_absolute_and_parent_patterns(tmp_path: Path):
+    """Tests that patterns are joined onto the base directory and normalized like glob."""
+    # Setup: A file at the project root
+    (tmp_path / "a.txt").touch()
+    (tmp_path / "sub").mkdir()
+
+    # Action: An absolute pattern, and a pattern that leaves and re-enters the project
+    absolute_result = main.find_files_by_pattern(
+        str(tmp_path / "sub"), os.path.join(str(tmp_path), "*.txt")
+    )
+    reentering_result = main.find_files_by_pattern(
+        str(tmp_path), os.path.join("..", tmp_path.name, "a.txt")
+    )
+    wildcard_parent_result = main.find_files_by_pattern(
+        str(tmp_path), os.path.join("*", "..", "*.txt")
+    )
+
+    # Assertion: All of them find the file at the project root
+    assert absolute_result == [os.path.join(".", "a.txt")]
+    assert reentering_result == [os.path.join(".", "a.txt")]
+    assert wildcard_parent_result == [os.path.join(".", "a.txt")]
+
+
+def test_find_files_by_pattern_follows_inside_dir_symlink(tmp_path: Path):
+    """Tests that explicit components follow directory symlinks pointing inside the project."""
+    # Setup: sublink -> sub, with files at two levels
+    (tmp_path / "sub" / "deep").mkdir(parents=True)
+    (tmp_path / "sub" / "s.txt").touch()
+    (tmp_path / "sub" / "deep" / "d.txt").touch()
+    (tmp_path / "sublink").symlink_to(tmp_path / "sub")
+
+    # Action: Wildcard and literal components through the symlink
+    wildcard_result = main.find_files_by_pattern(str(tmp_path), os.path.join("*", "*.txt"))
+    literal_result = main.find_files_by_pattern(
+        str(tmp_path), os.path.join("sublink", "deep", "*")
+    )
+    recursive_result = main.find_files_by_pattern(str(tmp_path), "*.txt", recursive=True)
+
+    # Assertion: Explicit components go through the symlink, '**' does not
+    assert sorted(wildcard_result) == [
+        os.path.join(".", "sub", "s.txt"),
+        os.path.join(".", "sublink", "s.txt"),
+    ]
+    assert literal_result == [os.path.join(".", "sublink", "deep", "d.txt")]
+    assert sorted(recursive_result) == [
+        os.path.join(".", "sub", "deep", "d.txt"),
+        os.path.join(".", "sub", "s.txt"),
+    ]
+
+
+def test_find_files_by_pattern_base_dir_symlink(tmp_path: Path):
+    """Tests that a symlinked base_dir reports results at the symlink location, as glob does."""
+    # Setup: A subdirectory, an in-project symlink to it, and an outside symlink to the project
+    (tmp_path / "sub" / "deep").mkdir(parents=True)
+    (tmp_path / "sub" / "c.txt").touch()
+    (tmp_path / "sub" / "deep" / "d.txt").touch()
+    (tmp_path / "sublink").symlink_to(tmp_path / "sub")
+    outside_link = tmp_path.parent / (tmp_path.name + "_link")
+    outside_link.symlink_to(tmp_path)
+
+    # Action: Search from the symlinked directories
+    flat = main.find_files_by_pattern(str(tmp_path / "sublink"), "*.txt")
+    recursive = main.find_files_by_pattern(str(tmp_path / "sublink"), "*.txt", recursive=True)
+    literal = main.find_files_by_pattern(str(tmp_path / "sublink"), "c.txt")
+    via_outside = main.find_files_by_pattern(str(outside_link / "sub"), "*.txt")
+
+    # Assertion: Results keep the symlink's path inside the project
+    assert flat == [os.path.join(".", "sublink", "c.txt")]
+    assert sorted(recursive) == [
+        os.path.join(".", "sublink", "c.txt"),
+        os.path.join(".", "sublink", "deep", "d.txt"),
+    ]
+    assert literal == [os.path.join(".", "sublink", "c.txt")]
+    # Assertion: A path that only reaches the project through an outside symlink is reported relative to the project
+    assert via_outside == [os.path.join(".", "sub", "c.txt")]
+
+
+def test_find_files_by_pattern_outside_allowed(tmp_path: Path):
+    """Tests that searching from a directory outside the allowed directory is rejected."""
+    # Action: Attempt to search from the parent of tmp_path
+    result = main.find_files_by_pattern(str(tmp_path.parent), "*")
+
+    # Assertion: Check if the result is an error string indicating 'Access denied'
+    assert isinstance(result, str)
+    assert "Error: Access denied" in result
+
+
+def test_find_files_by_pattern_does_not_escape_with_parent_segments(tmp_path: Path):
+    """Tests that '..' in the pattern cannot return paths outside the allowed directory."""
+    # Setup: Create a file next to (outside) the allowed directory
+    outside_file = tmp_path.parent / (tmp_path.name + "_outside.txt")
+    outside_file.touch()
+
+    # Action: Search with a pattern that climbs out of the base directory
+    result = main.find_files_by_pattern(str(tmp_path), os.path.join("..", "*_outside.txt"))
+
+    # Assertion: Nothing outside the allowed directory is returned
+    assert result == []
+
+
+def test_find_files_by_pattern_skips_symlink_escape(tmp_path: Path):
+    """Tests that symlinks pointing outside the allowed directory are neither followed nor returned."""
+    # Setup: Create an outside directory and link to it (and to a file in it) from inside
+    outside_dir = tmp_path.parent / (tmp_path.name + "_outside")
+    outside_dir.mkdir()
+    (outside_dir / "secret.txt").touch()
+    (tmp_path / "dir_link").symlink_to(outside_dir)
+    (tmp_path / "file_link.txt").symlink_to(outside_dir / "secret.txt")
+    (tmp_path / "inside.txt").touch()
+
+    # Action: Search recursively for every .txt file
+    result = main.find_files_by_pattern(str(tmp_path), "*.txt", recursive=True)
+
+    # Assertion: Only the regular file inside the allowed directory is returned
+    assert result == [os.path.join(".", "inside.txt")]
+
+
+def test_find_files_by_pattern_recursive_wide_tree(tmp_path: Path):
+    """Tests a recursive search over many sibling subtrees (walked in parallel)."""
+    # Setup: Create several subtrees, each with a match, a non-match and a hidden directory
+    expected = []
+    for i in range(20):
+        nested = tmp_path / f"dir{i}" / "nested"
+        nested.mkdir(parents=True)
+        (nested / f"match{i}.log").touch()
+        (nested / f"other{i}.txt").touch()
+        (tmp_path / f"dir{i}" / ".hidden").mkdir()
+        (tmp_path / f"dir{i}" / ".hidden" / "skipped.log").touch()
+        expected.append(os.path.join(".", f"dir{i}", "nested", f"match{i}.log"))
+
+    # Action: Search for *.log recursively
+    result = main.find_files_by_pattern(str(tmp_path), "*.log", recursive=True)
+
+    # Assertion: Every match is found exactly once, hidden directories are skipped
+    assert isinstance(result, list)
+    assert sorted(result) == sorted(expected)
+    # Assertion: The parallel walk returns the same order on every call
+    for _ in range(5):
+        assert main.find_files_by_pattern(str(tmp_path), "*.log", recursive=True) == result
+
+
+# --- Test Cases for read_local_file ---
+
+
+def test_read_local_file_success(tmp_path: Path):
+    """Tests reading a UTF-8 text file."""
+    # Setup: Create a file with multi-byte characters
+    file_path = tmp_path / "hello.txt"
+    file_path.write_text("こんにちは\nworld\n", encoding="utf-8")
+
+    # Action: Read the file
+    result = asyncio.run(main.read_local_file(str(file_path)))
+
+    # Assertion: The full content is returned
+    assert result == "こんにちは\nworld\n"
+
+
+def test_read_local_file_translates_newlines(tmp_path: Path):
+    """Tests that CRLF / CR newlines are returned as LF, like text-mode open()."""
+    # Setup: Create a file with mixed newlines
+    file_path = tmp_path / "newlines.txt"
+    file_path.write_bytes(b"a\r\nb\rc\n")
+
+    # Action: Read the file
+    result = asyncio.run(main.read_local_file(str(file_path)))
+
+    # Assertion: Newlines are normalized
+    assert result == "a\nb\nc\n"
+
+
+def test_read_local_file_empty(tmp_path: Path):
+    """Tests reading an empty file."""
+    # Setup: Create an empty file
+    file_path = tmp_path / "empty.txt"
+    file_path.touch()
+
+    # Action & Assertion: An empty string is returned
+    assert asyncio.run(main.read_local_file(str(file_path))) == ""
+
+
+def test_read_local_file_not_found(tmp_path: Path):
+    """Tests reading a non-existent file."""
+    # Action: Read a file that doesn't exist
+    result = asyncio.run(main.read_local_file(str(tmp_path / "missing.txt")))
+
+    # Assertion: Check if the result is an error string indicating 'not found'
+    assert "Error: File not found" in result
+
+
+def test_read_local_file_invalid_utf8(tmp_path: Path):
+    """Tests reading a file that is not valid UTF-8."""
+    # Setup: Create a file with invalid UTF-8 bytes
+    file_path = tmp_path / "binary.bin"
+    file_path.write_bytes(b"\xff\xfe\x00")
+
+    # Action: Read the file
+    result = asyncio.run(main.read_local_file(str(file_path)))
+
+    # Assertion: The decode error is reported as an error string
+    assert result.startswith("Error reading file")
+
+
+def test_read_local_file_concurrent(tmp_path: Path):
+    """Tests that several reads can be awaited concurrently."""
+    # Setup: Create several files with distinct content
+    paths = []
+    for i in range(8):
+        file_path = tmp_path / f"file{i}.txt"
+        file_path.write_text(f"content {i}", encoding="utf-8")
+        paths.append(str(file_path))
+
+    # Action: Read all files concurrently
+    async def read_all():
+        return await asyncio.gather(*(main.read_local_file(p) for p in paths))
+
+    results = asyncio.run(read_all())
+
+    # Assertion: Each result matches its own file
+    assert results == [f"content {i}" for i in range(8)]
+
+
+def test_read_local_file_outside_allowed(tmp_path: Path):
+    """Tests reading a file outside the allowed project directory."""
+    # Setup: Create a file next to (outside) the allowed directory
+    outside_file = tmp_path.parent / (tmp_path.name + "_outside.txt")
+    outside_file.write_text("secret", encoding="utf-8")
+
+    # Action: Attempt to read it
+    result = asyncio.run(main.read_local_file(str(outside_file)))
+
+    # Assertion: Check if the result is an error string indicating 'Access denied'
+    assert "Error: Access denied" in result
+
+
+# --- Test Cases for write_local_file ---
+
+
+def test_write_local_file_success(tmp_path: Path):
+    """Tests writing a new file, creating its parent directory."""
+    # Setup: Target a file inside a directory that doesn't exist yet
+    file_path = tmp_path / "new_dir" / "out.txt"
+
+    # Action: Write the file
+    result = asyncio.run(main.write_local_file(str(file_path), "こんにちは\nworld\n"))
+
+    # Assertion: The file exists with the exact UTF-8 content
+    assert result.startswith("Successfully wrote")
+    assert file_path.read_bytes() == "こんにちは\nworld\n".encode("utf-8")
+
+
+def test_write_local_file_overwrites(tmp_path: Path):
+    """Tests that an existing (longer) file is truncated and overwritten."""
+    # Setup: Create a file with longer content
+    file_path = tmp_path / "existing.txt"
+    file_path.write_text("a much longer original content", encoding="utf-8")
+
+    # Action: Overwrite with shorter content, then with empty content
+    asyncio.run(main.write_local_file(str(file_path), "short"))
+    short_content = file_path.read_text(encoding="utf-8")
+    asyncio.run(main.write_local_file(str(file_path), ""))
+
+    # Assertion: No trailing bytes from the previous content remain
+    assert short_content == "short"
+    assert file_path.read_bytes() == b""
+
+
+def test_write_local_file_outside_allowed(tmp_path: Path):
+    """Tests writing a file outside the allowed project directory."""
+    # Setup: Target a file next to (outside) the allowed directory
+    outside_file = tmp_path.parent / (tmp_path.name + "_outside.txt")
+
+    # Action: Attempt to write it
+    result = asyncio.run(main.write_local_file(str(outside_file), "data"))
+
+    # Assertion: Access is denied and nothing is written
+    assert "Error: Access denied" in result
+    assert not outside_file.exists()
+
+
+# --- Test Cases for symlinks and special files ---
+
+
+def test_read_local_file_follows_inside_symlink(tmp_path: Path):
+    """Tests that a symlink pointing inside the project, as returned by find_files_by_pattern, can be read."""
+    # Setup: A regular file and a symlink to it, both inside the allowed directory
+    target = tmp_path / "target.txt"
+    target.write_text("data", encoding="utf-8")
+    (tmp_path / "link.txt").symlink_to(target)
+    found = main.find_files_by_pattern(str(tmp_path), "link.txt")
+    assert found == [os.path.join(".", "link.txt")]
+
+    # Action: Read through the symlink
+    result = asyncio.run(main.read_local_file(str(tmp_path / "link.txt")))
+
+    # Assertion: The target's content is returned
+    assert result == "data"
+
+
+def test_read_local_file_rejects_symlink_to_special_file(tmp_path: Path):
+    """Tests that a symlink is checked by its target, so it cannot be used to open a FIFO."""
+    if not hasattr(os, "mkfifo"):
+        pytest.skip("FIFOs are not supported on this platform")
+    # Setup: A FIFO with no writer and a symlink to it
+    os.mkfifo(tmp_path / "pipe")
+    (tmp_path / "pipe_link").symlink_to(tmp_path / "pipe")
+
+    # Action: Read through the symlink
+    result = asyncio.run(main.read_local_file(str(tmp_path / "pipe_link")))
+
+    # Assertion: An error is returned immediately
+    assert "is not a regular file" in result
+
+
+def test_read_local_file_rejects_fifo(tmp_path: Path):
+    """Tests that reading a FIFO returns an error instead of blocking."""
+    if not hasattr(os, "mkfifo"):
+        pytest.skip("FIFOs are not supported on this platform")
+    # Setup: Create a FIFO with no writer
+    fifo_path = tmp_path / "pipe"
+    os.mkfifo(fifo_path)
+
+    # Action: Read the FIFO
+    result = asyncio.run(main.read_local_file(str(fifo_path)))
+
+    # Assertion: An error is returned immediately
+    assert "is not a regular file" in result
+
+
+def test_write_local_file_rejects_symlink(tmp_path: Path):
+    """Tests that writing through a symlinked file is rejected."""
+    # Setup: A regular file and a symlink to it
+    target = tmp_path / "target.txt"
+    target.write_text("original", encoding="utf-8")
+    (tmp_path / "link.txt").symlink_to(target)
+
+    # Action: Write through the symlink
+    result = asyncio.run(main.write_local_file(str(tmp_path / "link.txt"), "changed"))
+
+    # Assertion: The write is refused and the target is untouched
+    assert "is not a regular file" in result
+    assert target.read_text(encoding="utf-8") == "original"
+
+
+def test_write_local_file_rejects_symlinked_parent(tmp_path: Path):
+    """Tests that writing into a symlinked directory is rejected."""
+    # Setup: A real directory and a symlink to it
+    real_dir = tmp_path / "real"
+    real_dir.mkdir()
+    (tmp_path / "dir_link").symlink_to(real_dir)
+
+    # Action: Write a file via the symlinked directory
+    result = asyncio.run(
+        main.write_local_file(str(tmp_path / "dir_link" / "new.txt"), "data")
+    )
+
+    # Assertion: The write is refused and nothing is created
+    assert "is a symbolic link" in result
+    assert not (real_dir / "new.txt").exists()
+
+
+def test_find_files_by_pattern_recursive_tree_wider_than_fd_limit(tmp_path: Path):
+    """Tests a recursive search over more sibling directories than RLIMIT_NOFILE allows open at once."""
+    resource = pytest.importorskip("resource")
+    fd_dir = Path("/proc/self/fd")
+    if not fd_dir.is_dir():
+        pytest.skip("/proc/self/fd is not available on this platform")
+    # Setup: More sibling directories (each with a match) than the lowered fd limit
+    width = 400
+    for i in range(width):
+        (tmp_path / f"dir{i:03d}").mkdir()
+        (tmp_path / f"dir{i:03d}" / "x.txt").touch()
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # Leave only enough headroom for the currently open fds plus the worker threads
+    lowered = len(list(fd_dir.iterdir())) + 2 * main._FIND_MAX_WORKERS + 16
+    assert lowered < width
+    resource.setrlimit(resource.RLIMIT_NOFILE, (lowered, hard))
+    try:
+        # Action: Search for every x.txt recursively
+        result = main.find_files_by_pattern(str(tmp_path), "*.txt", recursive=True)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    # Assertion: No subtree is silently dropped
+    assert isinstance(result, list)
+    assert len(result) == width
+
+
+def test_find_files_by_pattern_recursive_closes_directory_fds(tmp_path: Path):
+    """Tests that the recursive walker does not leak directory file descriptors."""
+    fd_dir = Path("/proc/self/fd")
+    if not fd_dir.is_dir():
+        pytest.skip("/proc/self/fd is not available on this platform")
+    # Setup: A small tree with a few levels
+    (tmp_path / "a" / "b" / "c").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "c" / "x.txt").touch()
+    (tmp_path / "d").mkdir()
+    open_fds_before = len(list(fd_dir.iterdir()))
+
+    # Action: Run several recursive searches
+    for _ in range(10):
+        result = main.find_files_by_pattern(str(tmp_path), "*.txt", recursive=True)
+
+    # Assertion: The search still works and every opened fd was closed
+    assert result == [os.path.join(".", "a", "b", "c", "x.txt")]
+    assert len(list(fd_dir.iterdir())) == open_fds_before
+
+
+def test_find_files_by_pattern_recursive_opens_subdirectories_relative_to_parent(
+    tmp_path: Path, monkeypatch
+):
+    """Tests that subdirectories are opened relative to the parent directory fd (openat)."""
+    if not main._SCANDIR_FD_SUPPORTED:
+        pytest.skip("scandir(fd) / open(dir_fd) are not available on this platform")
+    # Setup: A nested tree, and record how directories are opened
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "x.txt").touch()
+    opened = []
+    real_open = os.open
+
+    def recording_open(path, flags, *args, **kwargs):
+        opened.append((path, kwargs.get("dir_fd")))
+        return real_open(path, flags, *args, **kwargs)
+
+    monkeypatch.setattr(os, "open", recording_open)
+
+    # Action: Search recursively
+    result = main.find_files_by_pattern(str(tmp_path), "*.txt", recursive=True)
+
+    # Assertion: Only the start directory is opened by its full path
+    assert result == [os.path.join(".", "a", "b", "x.txt")]
+    assert opened[0] == (str(tmp_path), None)
+    assert ("a", None) not in opened and ("b", None) not in opened
+    assert all(dir_fd is not None for _, dir_fd in opened[1:])
+
+
+def test_find_files_by_pattern_recursive_walk_stopped_early_closes_fds(tmp_path: Path):
+    """Tests that abandoning a parallel walk closes the directory fds it still holds."""
+    fd_dir = Path("/proc/self/fd")
+    if not fd_dir.is_dir():
+        pytest.skip("/proc/self/fd is not available on this platform")
+    # Setup: A wide tree with nested subdirectories
+    for i in range(50):
+        (tmp_path / f"dir{i}" / "nested").mkdir(parents=True)
+    open_fds_before = len(list(fd_dir.iterdir()))
+
+    # Action: Take only the first directory from the walk, then stop it
+    walk = main._scandir_tree_parallel(str(tmp_path))
+    next(walk)
+    walk.close()
+
+    # Assertion: Every fd held for openat was closed
+    assert len(list(fd_dir.iterdir())) == open_fds_before